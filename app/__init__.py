@@ -46,10 +46,13 @@ def create_app():
         
         # Create database tables
         db.create_all()
+        from .services import initial_setup, outlets
+        initial_setup.add_outlet_columns()
+        initial_setup.purge_idempotency_keys(db.session)
+        app.teardown_appcontext(outlets.close_outlet_sessions)
         
         # First-run setup
         if models.User.query.first() is None:
-            from .services import initial_setup
             initial_setup.create_default_admin()
             initial_setup.seed_initial_menu()
             
@@ -14,6 +14,14 @@ class User(db.Model, UserMixin):
     password_hash = db.Column(db.String(60), nullable=False)
     role = db.Column(db.String(20), nullable=False, default='admin')
 
+class Outlet(db.Model):
+    """Outlet model for each restaurant branch."""
+    id = db.Column(db.Integer, primary_key=True)
+    code = db.Column(db.String(20), unique=True, nullable=False)
+    name = db.Column(db.String(100), nullable=False)
+    # SQLite file (inside the instance folder) holding this outlet's orders; None keeps them in the main database.
+    db_file = db.Column(db.String(200), nullable=True)
+
 class MenuItem(db.Model):
     """MenuItem model for all food and beverage items."""
     id = db.Column(db.Integer, primary_key=True)
@@ -22,6 +30,8 @@ class MenuItem(db.Model):
     price = db.Column(db.Float, nullable=False)
     is_available = db.Column(db.Boolean, default=True)
     image_path = db.Column(db.String(200), nullable=False, default='default.jpg')
+    # None means the item is served at every outlet.
+    outlet_id = db.Column(db.Integer, db.ForeignKey('outlet.id'), nullable=True)
 
 class Customer(db.Model):
     """Customer model to store customer information."""
@@ -38,6 +48,7 @@ class Order(db.Model):
     total_amount = db.Column(db.Float, nullable=False)
     timestamp = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
     order_type = db.Column(db.String(20), nullable=False, default='Dine-In')
+    outlet_id = db.Column(db.Integer, db.ForeignKey('outlet.id'), nullable=True)
     items = db.relationship('OrderItem', backref='order', lazy=True, cascade="all, delete-orphan")
     transaction = db.relationship('PaymentTransaction', backref='order', uselist=False, cascade="all, delete-orphan")
 
@@ -56,3 +67,16 @@ class PaymentTransaction(db.Model):
     payment_method = db.Column(db.String(50), nullable=False)
     details = db.Column(db.String(200), nullable=True)
     timestamp = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+
+class PaymentIdempotencyKey(db.Model):
+    """
+    Stores the response to a payment request so client retries can be answered without paying twice.
+    Rows older than IDEMPOTENCY_KEY_RETENTION_DAYS are purged at startup.
+    """
+    id = db.Column(db.Integer, primary_key=True)
+    key = db.Column(db.String(64), unique=True, nullable=False)
+    order_id = db.Column(db.Integer, db.ForeignKey('order.id'), nullable=False)
+    status_code = db.Column(db.Integer, nullable=False)
+    response = db.Column(db.Text, nullable=False)
+    timestamp = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
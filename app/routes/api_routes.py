@@ -1,10 +1,18 @@
-from flask import Blueprint, jsonify, request, url_for, send_from_directory
+from flask import Blueprint, jsonify, request, url_for, send_from_directory, abort, current_app
 from app import db
-from app.models.models import MenuItem, Customer, Order, OrderItem, PaymentTransaction
+from app.models.models import MenuItem, Customer, Order, OrderItem, PaymentTransaction, PaymentIdempotencyKey, Outlet
 from flask_login import login_required
-from app.utils.pdf_generator import generate_invoice
+from app.utils.pdf_generator import generate_invoice, invoice_filename, parse_invoice_filename
+from app.services.forecasting import get_item_forecast
+from app.services.basket import get_basket_analysis
+from app.services.dashboard import DASHBOARD_SECTIONS, build_dashboard, range_days, range_start
+from app.services.outlets import get_outlet, order_session, outlet_code
+from app.utils.transport import compact_response, requested_fields
+from sqlalchemy.exc import IntegrityError
 import csv
 import io
+import json
+import os
 from datetime import datetime, timedelta
 
 api_bp = Blueprint('api', __name__)
@@ -12,7 +20,17 @@ api_bp = Blueprint('api', __name__)
 # Public API
 @api_bp.route('/menu', methods=['GET'])
 def get_menu():
-    items = MenuItem.query.filter_by(is_available=True).all()
+    code = outlet_code(request.args.get('outlet'))
+    outlet = get_outlet(code)
+    if code and outlet is None:
+        return jsonify({'error': 'Unknown outlet'}), 400
+    query = MenuItem.query.filter_by(is_available=True)
+    # Items tied to an outlet are only offered there; the rest are served everywhere.
+    if outlet:
+        query = query.filter(db.or_(MenuItem.outlet_id.is_(None), MenuItem.outlet_id == outlet.id))
+    else:
+        query = query.filter(MenuItem.outlet_id.is_(None))
+    items = query.all()
     menu_list = []
     for item in items:
         menu_list.append({
@@ -31,9 +49,13 @@ def create_order():
     customer_name = data.get('name')
     customer_phone = data.get('phone')
     order_type = data.get('orderType', 'Dine-In')
+    code = outlet_code(data.get('outlet'))
+    outlet = get_outlet(code)
 
     if not all([cart, customer_name, customer_phone]):
         return jsonify({'success': False, 'error': 'Missing data'}), 400
+    if code and outlet is None:
+        return jsonify({'success': False, 'error': 'Unknown outlet'}), 400
 
     # Find or create customer
     customer = Customer.query.filter_by(phone=customer_phone).first()
@@ -47,13 +69,15 @@ def create_order():
     gst = total_amount * 0.05
     final_total = total_amount + gst
     
+    session = order_session(outlet)
     new_order = Order(
         customer_id=customer.id,
         total_amount=final_total,
-        order_type=order_type
+        order_type=order_type,
+        outlet_id=outlet.id if outlet else None
     )
-    db.session.add(new_order)
-    db.session.commit()
+    session.add(new_order)
+    session.commit()
 
     for item in cart:
         menu_item = MenuItem.query.get(item['id'])
@@ -64,24 +88,61 @@ def create_order():
                 quantity=item['quantity'],
                 price_at_purchase=menu_item.price
             )
-            db.session.add(order_item)
+            session.add(order_item)
     
-    db.session.commit()
+    session.commit()
 
     return jsonify({
         'success': True, 
         'order_id': new_order.id,
-        'total': new_order.total_amount
+        'total': new_order.total_amount,
+        'outlet': outlet.code if outlet else None
     })
 
 
+def _stored_payment_response(session, idempotency_key, order_id):
+    """Returns the saved response for a repeated idempotency key, or None if the key is new."""
+    record = session.query(PaymentIdempotencyKey).filter_by(key=idempotency_key).first()
+    if record is None:
+        return None
+    if record.order_id != order_id:
+        return jsonify({'success': False, 'message': 'Idempotency key already used for another order'}), 422
+    return current_app.response_class(record.response, status=record.status_code, mimetype='application/json')
+
 @api_bp.route('/order/<int:order_id>/pay', methods=['POST'])
 def pay_for_order(order_id):
     data = request.get_json()
     payment_method = data.get('method')
-    
-    order = Order.query.get_or_404(order_id)
-    if order.status == 'paid':
+    idempotency_key = request.headers.get('Idempotency-Key')
+    code = outlet_code(data.get('outlet'))
+    outlet = get_outlet(code)
+
+    # Order ids restart in each outlet database, so never fall back to another outlet's order.
+    if code and outlet is None:
+        return jsonify({'success': False, 'message': 'Unknown outlet'}), 400
+    session = order_session(outlet)
+
+    if idempotency_key and len(idempotency_key) > 64:
+        return jsonify({'success': False, 'message': 'Idempotency key too long'}), 400
+
+    # A retry of a payment that already went through gets the original answer back.
+    if idempotency_key:
+        stored = _stored_payment_response(session, idempotency_key, order_id)
+        if stored is not None:
+            return stored
+
+    # Only one request can move the order out of 'pending'; concurrent ones update no row.
+    updated = session.query(Order)\
+        .filter(Order.id == order_id, Order.status == 'pending')\
+        .update({'status': 'paid'}, synchronize_session=False)
+    if not updated:
+        session.rollback()
+        if idempotency_key:
+            stored = _stored_payment_response(session, idempotency_key, order_id)
+            if stored is not None:
+                return stored
+        if session.get(Order, order_id) is None:
+            abort(404)
         return jsonify({'success': False, 'message': 'Order already paid'}), 400
 
     # Create payment transaction
@@ -93,29 +154,55 @@ def pay_for_order(order_id):
         details = f"UPI ID: {data.get('upi_id')}"
 
     transaction = PaymentTransaction(
-        order_id=order.id,
+        order_id=order_id,
         payment_method=payment_method,
         details=details
     )
-    db.session.add(transaction)
-    
-    # Update order status
-    order.status = 'paid'
-    db.session.commit()
-
-    # Generate PDF Invoice
-    bill_path = generate_invoice(order)
-    bill_url = url_for('api.download_invoice', filename=f'invoice_{order.id}.pdf', _external=True)
-
+    session.add(transaction)
 
-    return jsonify({
+    bill_url = url_for('api.download_invoice', filename=invoice_filename(order_id, outlet), _external=True)
+    result = {
         'success': True, 
         'message': 'Payment successful! Bill generated.',
         'bill_url': bill_url
-    })
+    }
+
+    # The response is saved in the same transaction as the payment, so a retry never sees one without the other.
+    if idempotency_key:
+        session.add(PaymentIdempotencyKey(
+            key=idempotency_key,
+            order_id=order_id,
+            status_code=200,
+            response=json.dumps(result)
+        ))
+    try:
+        session.commit()
+    except IntegrityError:
+        session.rollback()
+        return jsonify({'success': False, 'message': 'Idempotency key already used for another order'}), 422
+
+    # Generate PDF Invoice outside the transaction so the write lock isn't held while rendering.
+    # If it fails, download_invoice renders the bill on first request instead.
+    try:
+        generate_invoice(session.get(Order, order_id), outlet)
+    except Exception:
+        current_app.logger.exception('Invoice generation failed for order %s', order_id)
+
+    return jsonify(result)
 
 @api_bp.route('/invoices/<filename>')
 def download_invoice(filename):
+    # Regenerate a paid order's bill if it was never written or has been removed.
+    parsed = parse_invoice_filename(filename)
+    if parsed and not os.path.exists(os.path.join(current_app.instance_path, filename)):
+        code, order_id = parsed
+        outlet = get_outlet(code)
+        if code and (outlet is None or not outlet.db_file):
+            abort(404)
+        order = order_session(outlet).get(Order, order_id)
+        if order is None or order.status != 'paid':
+            abort(404)
+        generate_invoice(order, outlet)
     return send_from_directory('../instance', filename)
 
 
@@ -124,12 +211,14 @@ def download_invoice(filename):
 @login_required
 def get_admin_menu():
     items = MenuItem.query.all()
+    outlet_codes = dict(db.session.query(Outlet.id, Outlet.code).all())
     return jsonify([{
         'id': item.id,
         'name': item.name,
         'category': item.category,
         'price': item.price,
-        'is_available': item.is_available
+        'is_available': item.is_available,
+        'outlet': outlet_codes.get(item.outlet_id)
     } for item in items])
 
 @api_bp.route('/admin/menu/upload', methods=['POST'])
@@ -144,21 +233,30 @@ def upload_menu():
         stream = io.StringIO(file.stream.read().decode("UTF8"), newline=None)
         csv_input = csv.reader(stream)
         next(csv_input, None)  # Skip header
+        outlet_ids = dict(db.session.query(Outlet.code, Outlet.id).all())
         for row in csv_input:
-            name, category, price, is_available_str = row
+            # The optional fifth column restricts the item to one outlet; blank means every outlet.
+            name, category, price, is_available_str = row[:4]
+            code = row[4].strip() if len(row) > 4 else ''
             is_available = is_available_str.lower() in ['true', '1', 'yes']
+            if code and code not in outlet_ids:
+                db.session.rollback()
+                return jsonify({'error': f'Unknown outlet: {code}'}), 400
+            outlet_id = outlet_ids.get(code)
             
             menu_item = MenuItem.query.filter_by(name=name).first()
             if menu_item:
                 menu_item.category = category
                 menu_item.price = float(price)
                 menu_item.is_available = is_available
+                menu_item.outlet_id = outlet_id
             else:
                 menu_item = MenuItem(
                     name=name,
                     category=category,
                     price=float(price),
                     is_available=is_available,
+                    outlet_id=outlet_id,
                     image_path=f"{name}.jpg" # Assumes image exists
                 )
                 db.session.add(menu_item)
@@ -174,128 +272,90 @@ def download_menu():
     output = io.StringIO()
     writer = csv.writer(output)
     
-    writer.writerow(['name', 'category', 'price', 'is_available'])
+    outlet_codes = dict(db.session.query(Outlet.id, Outlet.code).all())
+    writer.writerow(['name', 'category', 'price', 'is_available', 'outlet'])
     for item in items:
-        writer.writerow([item.name, item.category, item.price, item.is_available])
+        writer.writerow([item.name, item.category, item.price, item.is_available, outlet_codes.get(item.outlet_id, '')])
     
     output.seek(0)
     return output.getvalue(), 200, {
         'Content-Disposition': 'attachment; filename=menu_export.csv',
         'Content-Type': 'text/csv'
     }
+
+@api_bp.route('/admin/outlets', methods=['GET'])
+@login_required
+def get_outlets():
+    outlets = Outlet.query.all()
+    return jsonify([{
+        'id': outlet.id,
+        'code': outlet.code,
+        'name': outlet.name,
+        'separate_db': bool(outlet.db_file)
+    } for outlet in outlets])
+
+@api_bp.route('/admin/outlets', methods=['POST'])
+@login_required
+def create_outlet():
+    data = request.get_json()
+    code = data.get('code')
+    name = data.get('name')
+
+    if not all([code, name]):
+        return jsonify({'error': 'Missing data'}), 400
+    if not isinstance(code, str) or not isinstance(name, str):
+        return jsonify({'error': 'Outlet code and name must be strings'}), 400
+    if not code.isalnum():
+        return jsonify({'error': 'Outlet code must be alphanumeric'}), 400
+    if Outlet.query.filter_by(code=code).first():
+        return jsonify({'error': 'Outlet already exists'}), 400
+
+    outlet = Outlet(
+        code=code,
+        name=name,
+        db_file=f'outlet_{code}.db' if data.get('separate_db') else None
+    )
+    db.session.add(outlet)
+    db.session.commit()
+    return jsonify({'message': 'Outlet created', 'id': outlet.id})
+
 @api_bp.route('/analytics/dashboard', methods=['GET'])
 @login_required
 def analytics_dashboard():
     range_param = request.args.get('range', '7d')
+    fields, unknown = requested_fields(DASHBOARD_SECTIONS)
+    if unknown:
+        return jsonify({
+            'error': f"Unknown fields: {', '.join(sorted(unknown))}",
+            'valid_fields': list(DASHBOARD_SECTIONS)
+        }), 400
 
-    if range_param == '1d':
-        start_date = datetime.utcnow() - timedelta(days=1)
-        group_by_hour = True
-    elif range_param == '30d':
-        start_date = datetime.utcnow() - timedelta(days=30)
-        group_by_hour = False
-    else:
-        start_date = datetime.utcnow() - timedelta(days=7)
-        group_by_hour = False
-
-    total_sales = db.session.query(db.func.sum(Order.total_amount))\
-        .filter(Order.status == 'paid', Order.timestamp >= start_date)\
-        .scalar() or 0
-    total_orders = db.session.query(db.func.count(Order.id))\
-        .filter(Order.status == 'paid', Order.timestamp >= start_date)\
-        .scalar() or 0
-    avg_order_value = total_sales / total_orders if total_orders > 0 else 0
-
-    labels, data = [], []
-    if group_by_hour:
-        for hour in range(24):
-            start_time = start_date.replace(hour=hour, minute=0, second=0, microsecond=0)
-            end_time = start_time + timedelta(hours=1)
-            sales_sum = db.session.query(db.func.sum(Order.total_amount)).filter(
-                Order.status == 'paid',
-                Order.timestamp >= start_time,
-                Order.timestamp < end_time
-            ).scalar() or 0
-            labels.append(start_time.strftime('%H:00'))
-            data.append(sales_sum)
-    else:
-        total_days = int(range_param.replace('d', '')) if range_param.endswith('d') else 7
-        today = datetime.utcnow().date()
-        for i in range(total_days - 1, -1, -1):
-            day = today - timedelta(days=i)
-            start_of_day = datetime.combine(day, datetime.min.time())
-            end_of_day = datetime.combine(day, datetime.max.time())
-            daily_sales = db.session.query(db.func.sum(Order.total_amount)).filter(
-                Order.status == 'paid',
-                Order.timestamp >= start_of_day,
-                Order.timestamp <= end_of_day
-            ).scalar() or 0
-            labels.append(day.strftime('%b %d'))
-            data.append(daily_sales)
-
-    sales_trends = {'labels': labels, 'data': data}
-
-    order_type_results = db.session.query(
-        Order.order_type,
-        db.func.sum(Order.total_amount)
-    ).filter(Order.status == 'paid', Order.timestamp >= start_date)\
-     .group_by(Order.order_type).all()
-    order_type = {
-        'labels': [r[0] for r in order_type_results],
-        'values': [float(r[1] or 0) for r in order_type_results]
-    }
+    # Without an outlet the head-office view merges every outlet.
+    code = request.args.get('outlet')
+    outlet = get_outlet(code)
+    if code and outlet is None:
+        return jsonify({'error': 'Unknown outlet'}), 400
 
-    payment_results = db.session.query(
-        PaymentTransaction.payment_method,
-        db.func.sum(Order.total_amount)
-    ).join(Order, PaymentTransaction.order_id == Order.id)\
-     .filter(Order.status == 'paid', Order.timestamp >= start_date)\
-     .group_by(PaymentTransaction.payment_method).all()
-    payment_methods = {
-        'labels': [r[0] for r in payment_results],
-        'values': [float(r[1] or 0) for r in payment_results]
-    }
+    return compact_response(build_dashboard(range_param, fields, outlet))
 
-    top_items_results = db.session.query(
-        MenuItem.name,
-        db.func.sum(OrderItem.quantity)
-    ).join(OrderItem, MenuItem.id == OrderItem.menu_item_id)\
-     .join(Order, OrderItem.order_id == Order.id)\
-     .filter(Order.status == 'paid', Order.timestamp >= start_date)\
-     .group_by(MenuItem.name)\
-     .order_by(db.func.sum(OrderItem.quantity).desc())\
-     .limit(10).all()
-    top_items = {
-        'labels': [r[0] for r in top_items_results],
-        'values': [int(r[1] or 0) for r in top_items_results]
-    }
 
-    all_items_results = db.session.query(
-        MenuItem.name,
-        db.func.sum(OrderItem.quantity)
-    ).join(OrderItem, MenuItem.id == OrderItem.menu_item_id)\
-     .join(Order, OrderItem.order_id == Order.id)\
-     .filter(Order.status == 'paid', Order.timestamp >= start_date)\
-     .group_by(MenuItem.name)\
-     .order_by(db.func.sum(OrderItem.quantity).desc())\
-     .all()
-    all_items = {
-        'labels': [r[0] for r in all_items_results],
-        'values': [int(r[1] or 0) for r in all_items_results]
-    }
+@api_bp.route('/analytics/forecast', methods=['GET'])
+@login_required
+def item_sales_forecast():
+    tomorrow = datetime.utcnow().date() + timedelta(days=1)
+    return jsonify(get_item_forecast(tomorrow))
 
-    return jsonify({
-        'kpis': {
-            'total_sales': float(total_sales),
-            'total_orders': total_orders,
-            'avg_order_value': float(avg_order_value)
-        },
-        'sales_trends': sales_trends,
-        'order_type': order_type,
-        'payment_methods': payment_methods,
-        'top_items': top_items,
-        'all_items': all_items
-    })
+
+@api_bp.route('/analytics/basket', methods=['GET'])
+@login_required
+def basket_analysis():
+    range_param = request.args.get('range', '7d')
+    limit = request.args.get('limit', 20, type=int)
+    if limit < 1:
+        return jsonify({'error': 'limit must be at least 1'}), 400
+
+    # Running totals are kept per window length, so unknown ranges share the 7-day state.
+    return jsonify(get_basket_analysis(range_days(range_param), range_start(range_param), limit))
 
 
 @api_bp.route('/analytics/items-sales/export', methods=['GET'])
@@ -303,22 +363,13 @@ def analytics_dashboard():
 def export_items_sales_csv():
     range_param = request.args.get('range', '7d')
 
-    if range_param == '1d':
-        start_date = datetime.utcnow() - timedelta(days=1)
-    elif range_param == '30d':
-        start_date = datetime.utcnow() - timedelta(days=30)
-    else:
-        start_date = datetime.utcnow() - timedelta(days=7)
-
-    results = db.session.query(
-        MenuItem.name,
-        db.func.sum(OrderItem.quantity)
-    ).join(OrderItem, MenuItem.id == OrderItem.menu_item_id)\
-     .join(Order, OrderItem.order_id == Order.id)\
-     .filter(Order.status == 'paid', Order.timestamp >= start_date)\
-     .group_by(MenuItem.name)\
-     .order_by(db.func.sum(OrderItem.quantity).desc())\
-     .all()
+    # Same merged ranking as the dashboard's all_items, so head office sees every outlet.
+    code = request.args.get('outlet')
+    outlet = get_outlet(code)
+    if code and outlet is None:
+        return jsonify({'error': 'Unknown outlet'}), 400
+    all_items = build_dashboard(range_param, {'all_items'}, outlet)['all_items']
+    results = zip(all_items['labels'], all_items['values'])
 
     output = io.StringIO()
     writer = csv.writer(output)
@@ -0,0 +1,116 @@
+from app import db
+from app.models.models import MenuItem, Order, OrderItem, PaymentTransaction
+import threading
+import numpy as np
+from scipy import sparse
+
+# Running co-occurrence totals per analytics range, so each refresh only has to
+# fold in orders paid since the last one and drop orders that left the window.
+_basket_state = {}
+_basket_lock = threading.Lock()
+
+def _basket_rows(start_date, end_date=None, after_txn_id=None, upto_txn_id=None):
+    """Returns distinct (order_id, menu_item_id) pairs for paid orders in the window."""
+    query = db.session.query(OrderItem.order_id, OrderItem.menu_item_id)\
+        .join(Order, OrderItem.order_id == Order.id)\
+        .join(PaymentTransaction, PaymentTransaction.order_id == Order.id)\
+        .filter(Order.status == 'paid', Order.timestamp >= start_date)
+    if end_date is not None:
+        query = query.filter(Order.timestamp < end_date)
+    if after_txn_id is not None:
+        query = query.filter(PaymentTransaction.id > after_txn_id)
+    if upto_txn_id is not None:
+        query = query.filter(PaymentTransaction.id <= upto_txn_id)
+    return query.distinct().all()
+
+def _co_occurrence(rows, n_items):
+    """Builds a sparse order x item matrix and returns (order count, item x item co-occurrence)."""
+    if not rows:
+        return 0, np.zeros((n_items, n_items), dtype=np.int64)
+    order_ids = np.array([r[0] for r in rows], dtype=np.int64)
+    item_ids = np.array([r[1] for r in rows], dtype=np.int64)
+    # Order items can still reference menu items that have since been removed.
+    n_items = max(n_items, int(item_ids.max()) + 1)
+    _, order_idx = np.unique(order_ids, return_inverse=True)
+    n_orders = int(order_idx.max()) + 1
+
+    basket = sparse.csr_matrix(
+        (np.ones(len(rows), dtype=np.int64), (order_idx, item_ids)),
+        shape=(n_orders, n_items)
+    )
+    # Repeated lines of the same item in one order still count as one basket hit.
+    basket.data[:] = 1
+    pairs = (basket.T @ basket).toarray()
+    return n_orders, pairs
+
+def _resize(matrix, n_items):
+    if matrix.shape[0] >= n_items:
+        return matrix
+    grown = np.zeros((n_items, n_items), dtype=matrix.dtype)
+    grown[:matrix.shape[0], :matrix.shape[1]] = matrix
+    return grown
+
+def _refresh_state(range_key, start_date):
+    """Brings the running totals for range_key up to date with the current window."""
+    n_items = (db.session.query(db.func.max(MenuItem.id)).scalar() or 0) + 1
+    watermark = db.session.query(db.func.max(PaymentTransaction.id)).scalar() or 0
+    state = _basket_state.get(range_key)
+
+    if state is None or start_date < state['start_date']:
+        n_orders, pairs = _co_occurrence(_basket_rows(start_date, upto_txn_id=watermark), n_items)
+        state = {'start_date': start_date, 'watermark': watermark, 'n_orders': n_orders, 'pairs': pairs}
+        _basket_state[range_key] = state
+        return state
+
+    pairs = _resize(state['pairs'], n_items)
+
+    # Orders that have slid out of the window since the last refresh.
+    expired_rows = _basket_rows(state['start_date'], end_date=start_date, upto_txn_id=state['watermark'])
+    expired_orders, expired_pairs = _co_occurrence(expired_rows, pairs.shape[0])
+
+    # Orders paid since the last refresh.
+    new_rows = _basket_rows(start_date, after_txn_id=state['watermark'], upto_txn_id=watermark)
+    new_orders, new_pairs = _co_occurrence(new_rows, pairs.shape[0])
+
+    n_items = max(pairs.shape[0], expired_pairs.shape[0], new_pairs.shape[0])
+    state['pairs'] = _resize(pairs, n_items) - _resize(expired_pairs, n_items) + _resize(new_pairs, n_items)
+    state['n_orders'] += new_orders - expired_orders
+    state['start_date'] = start_date
+    state['watermark'] = watermark
+    return state
+
+def get_basket_analysis(range_key, start_date, limit=20):
+    """
+    Returns the most frequent item pairs bought together since start_date,
+    with support, confidence (both directions) and lift for each pair.
+    """
+    with _basket_lock:
+        state = _refresh_state(range_key, start_date)
+        pairs = state['pairs'].copy()
+        n_orders = state['n_orders']
+
+    item_counts = np.diag(pairs)
+    first, second = np.triu_indices(pairs.shape[0], k=1)
+    counts = pairs[first, second]
+    keep = counts > 0
+    first, second, counts = first[keep], second[keep], counts[keep]
+
+    order = np.argsort(-counts, kind='stable')[:limit]
+    first, second, counts = first[order], second[order], counts[order]
+
+    support = counts / n_orders if n_orders else np.zeros(len(counts))
+    confidence_ab = counts / item_counts[first]
+    confidence_ba = counts / item_counts[second]
+    lift = counts * n_orders / (item_counts[first] * item_counts[second])
+
+    names = dict(db.session.query(MenuItem.id, MenuItem.name).all())
+    return {
+        'total_orders': int(n_orders),
+        'pairs': [{
+            'items': [names.get(int(a), str(a)), names.get(int(b), str(b))],
+            'count': int(c),
+            'support': round(float(s), 4),
+            'confidence': [round(float(ab), 4), round(float(ba), 4)],
+            'lift': round(float(l), 4)
+        } for a, b, c, s, ab, ba, l in zip(first, second, counts, support, confidence_ab, confidence_ba, lift)]
+    }
@@ -0,0 +1,148 @@
+from app import db
+from app.models.models import MenuItem, Order, OrderItem, PaymentTransaction
+from app.services.outlets import order_sources, fan_out
+from collections import Counter
+from datetime import datetime, timedelta
+
+DASHBOARD_SECTIONS = ('kpis', 'sales_trends', 'order_type', 'payment_methods', 'top_items', 'all_items')
+
+# Reporting windows in days for the analytics `range` parameter; anything else means 7 days.
+ANALYTICS_RANGES = {'1d': 1, '7d': 7, '30d': 30}
+
+def range_days(range_param):
+    """Returns the length in days of the reporting window for a range."""
+    return ANALYTICS_RANGES.get(range_param, 7)
+
+def range_start(range_param):
+    """Returns the start of the reporting window for a range."""
+    return datetime.utcnow() - timedelta(days=range_days(range_param))
+
+def dashboard_window(range_param):
+    """Works out the reporting start date and the sales-trend buckets for a range."""
+    start_date = range_start(range_param)
+
+    if range_param == '1d':
+        day = datetime.combine(start_date.date(), datetime.min.time())
+        buckets = [(f'{hour:02d}', f'{hour:02d}:00') for hour in range(24)]
+        trend = {'start': day, 'end': day + timedelta(days=1), 'format': '%H', 'buckets': buckets}
+    else:
+        total_days = int(range_param[:-1]) if range_param.endswith('d') and range_param[:-1].isdigit() else 7
+        # The trend always covers at least today.
+        total_days = max(total_days, 1)
+        today = datetime.utcnow().date()
+        days = [today - timedelta(days=i) for i in range(total_days - 1, -1, -1)]
+        buckets = [(day.isoformat(), day.strftime('%b %d')) for day in days]
+        trend = {
+            'start': datetime.combine(days[0], datetime.min.time()),
+            'end': datetime.combine(today, datetime.min.time()) + timedelta(days=1),
+            'format': '%Y-%m-%d',
+            'buckets': buckets
+        }
+    return start_date, trend
+
+def _partial_dashboard(session, outlet_id, fields, start_date, trend):
+    """Computes mergeable sums and counts for one order store."""
+    def paid(query, since=start_date):
+        query = query.filter(Order.status == 'paid', Order.timestamp >= since)
+        if outlet_id is not None:
+            query = query.filter(Order.outlet_id == outlet_id)
+        return query
+
+    partial = {}
+
+    if 'kpis' in fields:
+        total_sales, total_orders = paid(session.query(
+            db.func.sum(Order.total_amount),
+            db.func.count(Order.id)
+        )).one()
+        partial['total_sales'] = total_sales or 0
+        partial['total_orders'] = total_orders or 0
+
+    if 'sales_trends' in fields:
+        bucket = db.func.strftime(trend['format'], Order.timestamp)
+        rows = paid(session.query(bucket, db.func.sum(Order.total_amount)), since=trend['start'])\
+            .filter(Order.timestamp < trend['end'])\
+            .group_by(bucket).all()
+        partial['sales_trends'] = Counter({key: value or 0 for key, value in rows})
+
+    if 'order_type' in fields:
+        rows = paid(session.query(Order.order_type, db.func.sum(Order.total_amount)))\
+            .group_by(Order.order_type).all()
+        partial['order_type'] = Counter({key: float(value or 0) for key, value in rows})
+
+    if 'payment_methods' in fields:
+        rows = paid(session.query(PaymentTransaction.payment_method, db.func.sum(Order.total_amount))
+                    .join(Order, PaymentTransaction.order_id == Order.id))\
+            .group_by(PaymentTransaction.payment_method).all()
+        partial['payment_methods'] = Counter({key: float(value or 0) for key, value in rows})
+
+    if 'top_items' in fields or 'all_items' in fields:
+        # Every item's total is needed, not just this store's top-N, for the merged ranking to be right.
+        rows = paid(session.query(OrderItem.menu_item_id, db.func.sum(OrderItem.quantity))
+                    .join(Order, OrderItem.order_id == Order.id))\
+            .group_by(OrderItem.menu_item_id).all()
+        partial['items'] = Counter({key: int(value or 0) for key, value in rows})
+
+    return partial
+
+def _merge(partials, key):
+    merged = Counter()
+    for partial in partials:
+        merged.update(partial.get(key, {}))
+    return merged
+
+def build_dashboard(range_param, fields, outlet=None):
+    """
+    Builds the analytics dashboard for one outlet, or for every outlet when
+    outlet is None, by fanning the queries out and merging the partial results.
+    """
+    start_date, trend = dashboard_window(range_param)
+    partials = fan_out(
+        order_sources(outlet),
+        lambda session, outlet_id: _partial_dashboard(session, outlet_id, fields, start_date, trend)
+    )
+
+    dashboard = {}
+
+    if 'kpis' in fields:
+        total_sales = sum(p['total_sales'] for p in partials)
+        total_orders = sum(p['total_orders'] for p in partials)
+        avg_order_value = total_sales / total_orders if total_orders > 0 else 0
+        dashboard['kpis'] = {
+            'total_sales': float(total_sales),
+            'total_orders': total_orders,
+            'avg_order_value': float(avg_order_value)
+        }
+
+    if 'sales_trends' in fields:
+        sales = _merge(partials, 'sales_trends')
+        dashboard['sales_trends'] = {
+            'labels': [label for _, label in trend['buckets']],
+            'data': [sales.get(key, 0) for key, _ in trend['buckets']]
+        }
+
+    for section in ('order_type', 'payment_methods'):
+        if section in fields:
+            totals = _merge(partials, section)
+            labels = sorted(totals)
+            dashboard[section] = {'labels': labels, 'values': [totals[label] for label in labels]}
+
+    if 'top_items' in fields or 'all_items' in fields:
+        quantities = _merge(partials, 'items')
+        names = dict(db.session.query(MenuItem.id, MenuItem.name).all())
+        ranking = sorted(
+            ((names[item_id], qty) for item_id, qty in quantities.items() if item_id in names),
+            key=lambda r: r[1], reverse=True
+        )
+        if 'top_items' in fields:
+            dashboard['top_items'] = {
+                'labels': [r[0] for r in ranking[:10]],
+                'values': [r[1] for r in ranking[:10]]
+            }
+        if 'all_items' in fields:
+            dashboard['all_items'] = {
+                'labels': [r[0] for r in ranking],
+                'values': [r[1] for r in ranking]
+            }
+
+    return dashboard
@@ -0,0 +1,89 @@
+from app import db
+from app.models.models import MenuItem, Order, OrderItem
+from datetime import datetime, timedelta
+import numpy as np
+
+# How many past same-weekday days feed the baseline, and how quickly older weeks fade out.
+HISTORY_WEEKS = 8
+SMOOTHING_ALPHA = 0.3
+
+# Forecasts only change once a day, so they are kept here keyed by target date.
+_forecast_cache = {}
+
+def _smoothing_weights(n_weeks, alpha):
+    """Weights that reproduce simple exponential smoothing over n_weeks values (oldest first)."""
+    exponents = np.arange(n_weeks - 1, -1, -1)
+    weights = alpha * (1 - alpha) ** exponents
+    # The oldest value seeds the level, so it carries the remaining weight.
+    weights[0] = (1 - alpha) ** (n_weeks - 1)
+    return weights
+
+def _hourly_item_quantities(start_date, end_date):
+    """Returns per-item, per-day, per-hour quantities sold in one grouped query."""
+    day_col = db.func.strftime('%Y-%m-%d', Order.timestamp)
+    hour_col = db.func.strftime('%H', Order.timestamp)
+    return db.session.query(
+        OrderItem.menu_item_id,
+        day_col,
+        hour_col,
+        db.func.sum(OrderItem.quantity)
+    ).join(Order, OrderItem.order_id == Order.id)\
+     .filter(Order.status == 'paid', Order.timestamp >= start_date, Order.timestamp < end_date)\
+     .group_by(OrderItem.menu_item_id, day_col, hour_col)\
+     .all()
+
+def build_item_forecast(target_date):
+    """
+    Forecasts hourly demand for every menu item on target_date.
+
+    The baseline for each item and hour is the exponentially smoothed quantity
+    sold in that hour on the same weekday over the previous HISTORY_WEEKS weeks.
+    """
+    menu_items = MenuItem.query.order_by(MenuItem.id).all()
+    item_ids = np.array([item.id for item in menu_items], dtype=np.int64)
+
+    start_date = datetime.combine(target_date - timedelta(weeks=HISTORY_WEEKS), datetime.min.time())
+    end_date = datetime.combine(target_date, datetime.min.time())
+    rows = _hourly_item_quantities(start_date, end_date)
+
+    # history[item, week, hour], weeks ordered oldest to newest
+    history = np.zeros((len(menu_items), HISTORY_WEEKS, 24), dtype=np.float64)
+    if rows and len(menu_items):
+        row_item_ids = np.array([r[0] for r in rows], dtype=np.int64)
+        row_days = np.array([r[1] for r in rows], dtype='datetime64[D]')
+        row_hours = np.array([int(r[2]) for r in rows], dtype=np.int64)
+        row_qty = np.array([r[3] or 0 for r in rows], dtype=np.float64)
+
+        days_back = (np.datetime64(target_date, 'D') - row_days).astype(np.int64)
+        item_pos = np.searchsorted(item_ids, row_item_ids)
+        item_pos = np.clip(item_pos, 0, len(item_ids) - 1)
+        keep = (days_back % 7 == 0) & (item_ids[item_pos] == row_item_ids)
+
+        week_idx = HISTORY_WEEKS - days_back[keep] // 7
+        np.add.at(history, (item_pos[keep], week_idx, row_hours[keep]), row_qty[keep])
+
+    weights = _smoothing_weights(HISTORY_WEEKS, SMOOTHING_ALPHA)
+    forecast = np.tensordot(history, weights, axes=([1], [0]))
+    forecast = np.round(forecast, 2)
+
+    return {
+        'date': target_date.isoformat(),
+        'hours': [f'{hour:02d}:00' for hour in range(24)],
+        'items': [{
+            'id': item.id,
+            'name': item.name,
+            'hourly': forecast[i].tolist(),
+            'total': round(float(forecast[i].sum()), 2)
+        } for i, item in enumerate(menu_items)]
+    }
+
+def get_item_forecast(target_date):
+    """Returns the cached forecast for target_date, computing it on first request."""
+    key = target_date.isoformat()
+    forecast = _forecast_cache.get(key)
+    if forecast is None:
+        forecast = build_item_forecast(target_date)
+        # Only the current target is worth keeping around.
+        _forecast_cache.clear()
+        _forecast_cache[key] = forecast
+    return forecast
@@ -1,5 +1,7 @@
 from app import db, bcrypt
-from app.models.models import User, MenuItem
+from app.models.models import User, MenuItem, PaymentIdempotencyKey
+from flask import current_app
+from datetime import datetime, timedelta
 
 def create_default_admin():
     """Creates a default admin user if one doesn't exist."""
@@ -24,4 +26,21 @@ def seed_initial_menu():
         ]
         db.session.bulk_save_objects(menu_items)
         db.session.commit()
-        print("--- Initial menu items have been seeded into the database. ---")
\ No newline at end of file
+        print("--- Initial menu items have been seeded into the database. ---")
+
+def add_outlet_columns():
+    """Adds the outlet columns to databases created before multi-outlet support."""
+    inspector = db.inspect(db.engine)
+    for table in ('menu_item', 'order'):
+        columns = {column['name'] for column in inspector.get_columns(table)}
+        if 'outlet_id' not in columns:
+            db.session.execute(db.text(f'ALTER TABLE "{table}" ADD COLUMN outlet_id INTEGER REFERENCES outlet(id)'))
+    db.session.commit()
+
+def purge_idempotency_keys(session):
+    """Deletes payment idempotency keys older than the configured retention window."""
+    cutoff = datetime.utcnow() - timedelta(days=current_app.config.get('IDEMPOTENCY_KEY_RETENTION_DAYS', 7))
+    session.query(PaymentIdempotencyKey)\
+        .filter(PaymentIdempotencyKey.timestamp < cutoff)\
+        .delete(synchronize_session=False)
+    session.commit()
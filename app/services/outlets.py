@@ -0,0 +1,82 @@
+from app import db
+from app.models.models import Outlet, Order, OrderItem, PaymentTransaction, PaymentIdempotencyKey
+from app.services.initial_setup import purge_idempotency_keys
+from flask import current_app, g
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+from concurrent.futures import ThreadPoolExecutor
+import os
+import threading
+
+# Tables that live in an outlet's own SQLite file. Menu, customers and users stay central.
+SHARD_TABLES = [Order.__table__, OrderItem.__table__, PaymentTransaction.__table__, PaymentIdempotencyKey.__table__]
+
+_shard_engines = {}
+_shard_lock = threading.Lock()
+
+def outlet_code(code):
+    """Returns the requested outlet code, falling back to the terminal's configured outlet."""
+    return code or current_app.config.get('OUTLET_CODE')
+
+def get_outlet(code):
+    """Looks up an outlet by code; None when no code is given or it is unknown."""
+    if not code:
+        return None
+    return Outlet.query.filter_by(code=code).first()
+
+def shard_engine(outlet):
+    """Returns the engine for an outlet's own SQLite file, creating the file on first use."""
+    path = os.path.join(current_app.instance_path, outlet.db_file)
+    with _shard_lock:
+        engine = _shard_engines.get(path)
+        if engine is None:
+            engine = create_engine('sqlite:///' + path)
+            db.metadata.create_all(engine, tables=SHARD_TABLES)
+            with Session(engine) as session:
+                purge_idempotency_keys(session)
+            _shard_engines[path] = engine
+    return engine
+
+def order_session(outlet):
+    """
+    Returns the session that holds orders for the given outlet.
+    Shard sessions are opened once per request and closed on teardown.
+    """
+    if outlet is None or not outlet.db_file:
+        return db.session
+    sessions = g.setdefault('outlet_sessions', {})
+    if outlet.code not in sessions:
+        sessions[outlet.code] = Session(shard_engine(outlet))
+    return sessions[outlet.code]
+
+def close_outlet_sessions(exception=None):
+    for session in g.pop('outlet_sessions', {}).values():
+        session.close()
+
+def order_sources(outlet=None):
+    """
+    Returns (engine, outlet_id filter) pairs covering the orders of one outlet,
+    or of every outlet for the head-office view.
+    """
+    if outlet is not None:
+        if outlet.db_file:
+            return [(shard_engine(outlet), None)]
+        return [(db.engine, outlet.id)]
+
+    sources = [(db.engine, None)]
+    for sharded in Outlet.query.filter(Outlet.db_file.isnot(None)).all():
+        sources.append((shard_engine(sharded), None))
+    return sources
+
+def fan_out(sources, partial_fn):
+    """Runs partial_fn(session, outlet_id) against every source in parallel and returns the results."""
+    def run(source):
+        engine, outlet_id = source
+        with Session(engine) as session:
+            return partial_fn(session, outlet_id)
+
+    if len(sources) == 1:
+        return [run(sources[0])]
+    workers = min(len(sources), current_app.config.get('OUTLET_QUERY_WORKERS', 8))
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(run, sources))
@@ -95,7 +95,8 @@ document.addEventListener('DOMContentLoaded', () => {
                 if (!response.ok) throw new Error(result.error || 'An unknown server error occurred.');
                 
                 if (result.success) {
-                    window.location.href = `/payment?order_id=${result.order_id}&total=${result.total}`;
+                    const outletParam = result.outlet ? `&outlet=${encodeURIComponent(result.outlet)}` : '';
+                    window.location.href = `/payment?order_id=${result.order_id}&total=${result.total}${outletParam}`;
                 } else {
                     alert('Error placing order: ' + (result.error || 'Unknown error'));
                 }
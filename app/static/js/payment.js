@@ -15,6 +15,9 @@ document.addEventListener('DOMContentLoaded', function () {
     const urlParams = new URLSearchParams(window.location.search);
     const orderId = urlParams.get('order_id');
     const total = urlParams.get('total');
+    const outlet = urlParams.get('outlet');
+    // Sent with every attempt for this order so a retried request can't charge twice.
+    const idempotencyKey = `${orderId}-${Date.now()}-${Math.random().toString(36).slice(2, 10)}`;
 
     if (total) {
         totalEl.textContent = `₹${parseFloat(total).toFixed(2)}`;
@@ -72,12 +75,13 @@ document.addEventListener('DOMContentLoaded', function () {
     expYearInput.addEventListener('input', validateExpiry);
     
     async function handlePayment(url, data) {
+        if (outlet) data.outlet = outlet;
         messageEl.textContent = 'Processing payment...';
         messageEl.className = 'mt-4 text-center text-sky-400';
         try {
             const response = await fetch(url, {
                 method: 'POST',
-                headers: { 'Content-Type': 'application/json' },
+                headers: { 'Content-Type': 'application/json', 'Idempotency-Key': idempotencyKey },
                 body: JSON.stringify(data)
             });
             const result = await response.json();
@@ -3,22 +3,42 @@ from reportlab.pdfgen import canvas
 from reportlab.lib.units import inch
 from app.models.models import MenuItem, Customer
 import os
+import re
+import threading
 from flask import current_app
 
-def generate_invoice(order):
+INVOICE_FILENAME_RE = re.compile(r'invoice_(?:([A-Za-z0-9]+)_)?(\d+)\.pdf')
+
+def invoice_filename(order_id, outlet=None):
+    """Returns the invoice file name for an order."""
+    # Order ids restart in each outlet database, so those invoices carry the outlet code.
+    if outlet is not None and outlet.db_file:
+        return f'invoice_{outlet.code}_{order_id}.pdf'
+    return f'invoice_{order_id}.pdf'
+
+def parse_invoice_filename(filename):
+    """Returns (outlet code or None, order id) for an invoice file name, or None if it isn't one."""
+    match = INVOICE_FILENAME_RE.fullmatch(filename)
+    if match is None:
+        return None
+    return match.group(1), int(match.group(2))
+
+def generate_invoice(order, outlet=None):
     """Generates a POS-style receipt invoice for a given order."""
     instance_path = current_app.instance_path
     
     if not os.path.exists(instance_path):
         os.makedirs(instance_path)
         
-    bill_path = os.path.join(instance_path, f'invoice_{order.id}.pdf')
+    bill_path = os.path.join(instance_path, invoice_filename(order.id, outlet))
 
     # Small receipt width (~3 inches), fixed height
     receipt_width = 3 * inch
     receipt_height = 11 * inch
 
-    c = canvas.Canvas(bill_path, pagesize=(receipt_width, receipt_height))
+    # Render to a private file and swap it in, so a concurrent download never sees a half-written PDF.
+    tmp_path = f'{bill_path}.{os.getpid()}.{threading.get_ident()}.tmp'
+    c = canvas.Canvas(tmp_path, pagesize=(receipt_width, receipt_height))
     width, height = receipt_width, receipt_height
 
     # Draw border
@@ -112,3 +132,5 @@ def generate_invoice(order):
     c.drawCentredString(width / 2, y_pos, "Visit Again!")
 
     c.save()
+    os.replace(tmp_path, bill_path)
+    return bill_path
@@ -0,0 +1,93 @@
+from flask import request, jsonify, current_app
+import gzip
+import struct
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+MSGPACK_MIMETYPE = 'application/x-msgpack'
+
+# Below this size compression costs the tablet more than it saves on the wire.
+COMPRESS_MIN_BYTES = 1024
+
+# Responses are compressed per request, so favour speed over the last few percent of size.
+BROTLI_QUALITY = 5
+GZIP_LEVEL = 6
+
+# Keys whose values are numeric series and get packed as float32 arrays in MessagePack.
+SERIES_KEYS = ('data', 'values')
+
+def requested_fields(available):
+    """
+    Parses the comma-separated `fields=` query parameter into (fields, unknown).
+    Returns every available section when the parameter is missing or empty.
+    """
+    raw = request.args.get('fields', '')
+    fields = {f.strip() for f in raw.split(',') if f.strip()}
+    if not fields:
+        return set(available), set()
+    return fields, fields - set(available)
+
+def _pack_float32(values):
+    return struct.pack(f'<{len(values)}f', *values)
+
+def _pack_series(payload):
+    """Replaces numeric series with little-endian float32 byte strings."""
+    if isinstance(payload, dict):
+        packed = {}
+        for key, value in payload.items():
+            if key in SERIES_KEYS and isinstance(value, list):
+                packed[key] = _pack_float32(value)
+            else:
+                packed[key] = _pack_series(value)
+        return packed
+    if isinstance(payload, list):
+        return [_pack_series(v) for v in payload]
+    return payload
+
+def _choose_encoding():
+    if brotli is not None and request.accept_encodings['br']:
+        return 'br'
+    if request.accept_encodings['gzip']:
+        return 'gzip'
+    return None
+
+def compact_response(payload):
+    """
+    Serializes payload in the most compact format the client asked for.
+
+    Clients that send `Accept: application/x-msgpack` get MessagePack with numeric
+    series packed as float32 arrays; everyone else gets JSON. Either body is
+    brotli- or gzip-compressed according to `Accept-Encoding`.
+    """
+    use_msgpack = msgpack is not None and \
+        request.accept_mimetypes[MSGPACK_MIMETYPE] > request.accept_mimetypes['application/json']
+
+    if use_msgpack:
+        response = current_app.response_class(
+            msgpack.packb(_pack_series(payload), use_bin_type=True),
+            mimetype=MSGPACK_MIMETYPE
+        )
+        response.headers['X-Series-Encoding'] = 'float32-le'
+    else:
+        response = jsonify(payload)
+
+    response.vary.update(('Accept', 'Accept-Encoding'))
+
+    body = response.get_data()
+    encoding = _choose_encoding()
+    if encoding and len(body) >= COMPRESS_MIN_BYTES:
+        if encoding == 'br':
+            body = brotli.compress(body, quality=BROTLI_QUALITY)
+        else:
+            body = gzip.compress(body, compresslevel=GZIP_LEVEL)
+        response.set_data(body)
+        response.headers['Content-Encoding'] = encoding
+    return response
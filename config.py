@@ -15,3 +15,12 @@ class Config:
     SQLALCHEMY_DATABASE_URI = 'sqlite:///' + os.path.join(basedir, 'instance', 'restaurant.db')
     
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+
+    # Outlet this terminal belongs to; orders that don't name an outlet are booked here.
+    OUTLET_CODE = os.environ.get('POS_OUTLET')
+
+    # Upper bound on outlet databases queried in parallel for head-office analytics.
+    OUTLET_QUERY_WORKERS = 8
+
+    # Payment idempotency keys older than this are purged at startup; retries must arrive within it.
+    IDEMPOTENCY_KEY_RETENTION_DAYS = 7
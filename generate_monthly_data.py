@@ -9,6 +9,14 @@ sys.path.append(os.path.abspath(os.path.dirname(__file__)))
 from app import create_app, db
 from app.models.models import MenuItem, Customer, Order, OrderItem, PaymentTransaction
 
+# Traffic shape of a typical day, shared with load_test.py.
+ORDERS_PER_DAY = (20, 60)
+OPENING_HOURS = (9, 22)
+ITEMS_PER_ORDER = (1, 5)
+QUANTITY_PER_ITEM = (1, 3)
+ORDER_TYPES = ['Dine-In', 'Takeaway', 'Delivery']
+PAYMENT_METHODS = ['Card', 'UPI', 'Cash']
+
 def generate_historical_sales_data():
     """
     Generates two years of realistic, random sales data and saves it to the database.
@@ -31,7 +39,7 @@ def generate_historical_sales_data():
 
         while current_date <= end_date:
             # Create a random number of orders for the current day
-            num_orders_today = random.randint(20, 60) 
+            num_orders_today = random.randint(*ORDERS_PER_DAY)
             
             for _ in range(num_orders_today):
                 customer_phone = f"98765{random.randint(10000, 99999)}"
@@ -42,7 +50,7 @@ def generate_historical_sales_data():
                     db.session.commit()
 
                 order_timestamp = current_date.replace(
-                    hour=random.randint(9, 22), 
+                    hour=random.randint(*OPENING_HOURS), 
                     minute=random.randint(0, 59),
                     second=random.randint(0, 59)
                 )
@@ -51,17 +59,17 @@ def generate_historical_sales_data():
                     customer_id=customer.id,
                     status='paid',
                     total_amount=0, 
-                    order_type=random.choice(['Dine-In', 'Takeaway', 'Delivery']),
+                    order_type=random.choice(ORDER_TYPES),
                     timestamp=order_timestamp
                 )
                 db.session.add(new_order)
                 db.session.commit()
 
                 order_total = 0
-                num_items_in_order = random.randint(1, 5)
+                num_items_in_order = random.randint(*ITEMS_PER_ORDER)
                 for _ in range(num_items_in_order):
                     menu_item = random.choice(menu_items)
-                    quantity = random.randint(1, 3)
+                    quantity = random.randint(*QUANTITY_PER_ITEM)
                     item_total = menu_item.price * quantity
                     order_total += item_total
                     
@@ -79,7 +87,7 @@ def generate_historical_sales_data():
                 
                 transaction = PaymentTransaction(
                     order_id=new_order.id,
-                    payment_method=random.choice(['Card', 'UPI', 'Cash']),
+                    payment_method=random.choice(PAYMENT_METHODS),
                     details="Automated historical generation"
                 )
                 db.session.add(transaction)
@@ -0,0 +1,232 @@
+import sys
+import os
+import argparse
+import json
+import math
+import random
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from http.cookiejar import CookieJar
+
+# This allows Python to find generate_monthly_data.py
+sys.path.append(os.path.abspath(os.path.dirname(__file__)))
+
+from generate_monthly_data import (
+    ORDERS_PER_DAY, OPENING_HOURS, ITEMS_PER_ORDER, QUANTITY_PER_ITEM, ORDER_TYPES, PAYMENT_METHODS
+)
+
+# Average gap between orders at one terminal on a busy day, in seconds.
+# OPENING_HOURS is inclusive of the last hour, as in generate_monthly_data.py.
+BUSY_DAY_ORDER_GAP = (OPENING_HOURS[1] - OPENING_HOURS[0] + 1) * 3600 / ORDERS_PER_DAY[1]
+
+# Menu polls a terminal makes while a customer is choosing.
+MENU_POLLS_PER_ORDER = (1, 3)
+
+DASHBOARD_RANGES = ['1d', '7d', '30d']
+
+
+class LoadStats:
+    """Collects latencies and errors per endpoint across all worker threads."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = {}
+        self.errors = {}
+        self.failed_workers = []
+
+    def record(self, endpoint, seconds, ok):
+        with self.lock:
+            self.latencies.setdefault(endpoint, []).append(seconds)
+            if not ok:
+                self.errors[endpoint] = self.errors.get(endpoint, 0) + 1
+
+    def worker_failed(self, reason):
+        with self.lock:
+            self.failed_workers.append(reason)
+
+    def report(self, elapsed):
+        lines = [
+            f"{'Endpoint':<32}{'Requests':>9}{'Req/s':>9}{'p50 ms':>9}{'p90 ms':>9}"
+            f"{'p99 ms':>9}{'Max ms':>9}{'Errors':>9}"
+        ]
+        for endpoint in sorted(self.latencies):
+            samples = sorted(self.latencies[endpoint])
+            errors = self.errors.get(endpoint, 0)
+            lines.append(
+                f"{endpoint:<32}{len(samples):>9}{len(samples) / elapsed:>9.1f}"
+                f"{percentile(samples, 50) * 1000:>9.1f}{percentile(samples, 90) * 1000:>9.1f}"
+                f"{percentile(samples, 99) * 1000:>9.1f}{samples[-1] * 1000:>9.1f}"
+                f"{errors / len(samples):>9.1%}"
+            )
+        for reason in self.failed_workers:
+            lines.append(f"!!! Worker stopped: {reason}")
+        return '\n'.join(lines)
+
+
+def percentile(sorted_samples, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    rank = max(1, math.ceil(pct / 100 * len(sorted_samples)))
+    return sorted_samples[rank - 1]
+
+
+class NoRedirectHandler(urllib.request.HTTPRedirectHandler):
+    """Surfaces redirects as errors; the API never redirects unless the session has lost its login."""
+
+    def redirect_request(self, req, fp, code, msg, headers, newurl):
+        return None
+
+
+class Client:
+    """A single terminal or admin browser session against the server."""
+
+    def __init__(self, base_url, stats):
+        self.base_url = base_url.rstrip('/')
+        self.stats = stats
+        self.opener = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(CookieJar()),
+            NoRedirectHandler()
+        )
+
+    def call(self, endpoint, method, path, payload=None, headers=None, expect_json=True):
+        """
+        Sends one request, records its latency, and returns the decoded body (or None on error).
+        A reply that should be JSON but isn't, such as an HTML login page, counts as an error.
+        """
+        url = path if path.startswith('http') else self.base_url + path
+        body = json.dumps(payload).encode('utf-8') if payload is not None else None
+        request = urllib.request.Request(url, data=body, method=method, headers=headers or {})
+        if body is not None:
+            request.add_header('Content-Type', 'application/json')
+
+        start = time.perf_counter()
+        try:
+            with self.opener.open(request, timeout=30) as response:
+                data = response.read()
+                is_json = response.headers.get_content_type() == 'application/json'
+        except (urllib.error.URLError, OSError):
+            data = None
+            is_json = False
+
+        if data is not None and expect_json:
+            data = json.loads(data) if is_json else None
+        self.stats.record(endpoint, time.perf_counter() - start, data is not None)
+        return data
+
+
+def run_terminal(client, deadline, speedup, outlet=None):
+    """
+    Replays customers at one POS terminal: browse the menu, order, pay, download the bill.
+    Orders and payments go to `outlet` when given.
+    """
+    menu_path = f"/api/menu?outlet={urllib.parse.quote(outlet)}" if outlet else '/api/menu'
+    while time.monotonic() < deadline:
+        menu = None
+        for _ in range(random.randint(*MENU_POLLS_PER_ORDER)):
+            menu = client.call('GET /api/menu', 'GET', menu_path) or menu
+        if not menu:
+            time.sleep(1)
+            continue
+
+        cart = []
+        for menu_item in random.sample(menu, min(len(menu), random.randint(*ITEMS_PER_ORDER))):
+            cart.append({
+                'id': menu_item['id'],
+                'price': menu_item['price'],
+                'quantity': random.randint(*QUANTITY_PER_ITEM)
+            })
+        order = client.call('POST /api/order', 'POST', '/api/order', {
+            'cart': cart,
+            'name': f"Customer {random.randint(1, 1000)}",
+            'phone': f"98765{random.randint(10000, 99999)}",
+            'orderType': random.choice(ORDER_TYPES),
+            'outlet': outlet
+        })
+
+        if order and order.get('success'):
+            method = random.choice(PAYMENT_METHODS)
+            payment = {'method': method, 'outlet': outlet}
+            if method == 'Card':
+                payment['cardnumber'] = '4111111111111111'
+            elif method == 'UPI':
+                payment['upi_id'] = 'loadtest@upi'
+            result = client.call(
+                'POST /api/order/<id>/pay', 'POST', f"/api/order/{order['order_id']}/pay", payment,
+                headers={'Idempotency-Key': f"load-{order['order_id']}-{random.getrandbits(32)}"}
+            )
+            if result and result.get('success'):
+                client.call('GET /api/invoices/<file>', 'GET', result['bill_url'], expect_json=False)
+
+        time.sleep(random.expovariate(speedup / BUSY_DAY_ORDER_GAP))
+
+
+def run_admin(client, deadline, refresh_interval, username, password):
+    """Replays an admin keeping the analytics page open and switching ranges."""
+    login = client.call('POST /auth/api/admin/login', 'POST', '/auth/api/admin/login',
+                        {'username': username, 'password': password})
+    if not login or not login.get('success'):
+        client.stats.worker_failed(f"admin login as '{username}' failed; no analytics traffic was sent")
+        return
+    while time.monotonic() < deadline:
+        range_param = random.choice(DASHBOARD_RANGES)
+        client.call('GET /api/analytics/dashboard', 'GET', f'/api/analytics/dashboard?range={range_param}')
+        time.sleep(random.expovariate(1 / refresh_interval))
+
+
+def run_load_test(base_url, terminals, admins, duration, speedup, refresh_interval, username, password,
+                  outlet=None):
+    """
+    Runs terminal and admin workers in threads against a running server for
+    `duration` seconds and prints throughput, latency percentiles and error
+    rates per endpoint. Terminal orders are booked at `outlet` when given.
+    """
+    stats = LoadStats()
+    deadline = time.monotonic() + duration
+    workers = []
+    for _ in range(terminals):
+        workers.append(threading.Thread(
+            target=run_terminal,
+            args=(Client(base_url, stats), deadline, speedup, outlet)
+        ))
+    for _ in range(admins):
+        workers.append(threading.Thread(
+            target=run_admin,
+            args=(Client(base_url, stats), deadline, refresh_interval, username, password)
+        ))
+
+    print(f"--- Replaying traffic from {terminals} terminal(s) and {admins} admin(s) "
+          f"against {base_url} for {duration}s ---")
+    if outlet:
+        print(f"--- Orders are booked at outlet '{outlet}' ---")
+    else:
+        print("--- No --outlet given: paid test orders go into the main database and its analytics ---")
+    start = time.monotonic()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    elapsed = time.monotonic() - start
+
+    print(stats.report(elapsed))
+    return stats
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Replay realistic POS traffic against a running server.')
+    parser.add_argument('--base-url', default='http://127.0.0.1:5000')
+    parser.add_argument('--terminals', type=int, default=10, help='concurrent POS terminals')
+    parser.add_argument('--admins', type=int, default=1, help='concurrent admins refreshing analytics')
+    parser.add_argument('--duration', type=float, default=60, help='test length in seconds')
+    parser.add_argument('--speedup', type=float, default=1000,
+                        help='how much faster than a busy day each terminal takes orders')
+    parser.add_argument('--refresh-interval', type=float, default=5,
+                        help='mean seconds between analytics refreshes per admin')
+    parser.add_argument('--username', default='admin')
+    parser.add_argument('--password', default='admin123')
+    parser.add_argument('--outlet', help='outlet code to book test orders at, ideally a throwaway separate_db outlet')
+    args = parser.parse_args()
+
+    run_load_test(args.base_url, args.terminals, args.admins, args.duration, args.speedup,
+                  args.refresh_interval, args.username, args.password, args.outlet)